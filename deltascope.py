@@ -1,31 +1,43 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
-from dataclasses import dataclass, field
-from typing import List, Optional, Tuple
-from web3 import Web3
-from web3.types import LogReceipt
-from hexbytes import HexBytes
-from tabulate import tabulate
-
-# --- Event signatures ---
-SIG_TRANSFER = Web3.keccak(text="Transfer(address,address,uint256)").hex()
-SIG_APPROVAL = Web3.keccak(text="Approval(address,address,uint256)").hex()
-SIG_TF_SINGLE = Web3.keccak(text="TransferSingle(address,address,address,uint256,uint256)").hex()
-SIG_TF_BATCH = Web3.keccak(text="TransferBatch(address,address,address,uint256[],uint256[])").hex()
-
-ERC20_ABI = [
-    {"constant": True, "inputs": [], "name": "symbol", "outputs": [{"name": "", "type": "string"}], "type": "function"},
-    {"constant": True, "inputs": [], "name": "decimals", "outputs": [{"name": "", "type": "uint8"}], "type": "function"},
-]
-
-ERC721_ABI = [
-    {"constant": True, "inputs": [], "name": "symbol", "outputs": [{"name": "", "type": "string"}], "type": "function"},
-]
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
+
+# web3/eth_abi/aiohttp/tabulate тянут сотни мс импорта — грузим их в функциях,
+# чтобы `--help` и импорт модуля как библиотеки оставались мгновенными
+if TYPE_CHECKING:
+    import aiohttp
+    from web3 import Web3
+    from web3.types import LogReceipt
+
+# --- Event signatures (bytes, сравниваются с topics[0] напрямую) ---
+# Константы протокола, захардкожены, чтобы не считать keccak при импорте
+# Web3.keccak(text="Transfer(address,address,uint256)")
+SIG_TRANSFER = bytes.fromhex("ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef")
+# Web3.keccak(text="Approval(address,address,uint256)")
+SIG_APPROVAL = bytes.fromhex("8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925")
+# Web3.keccak(text="TransferSingle(address,address,address,uint256,uint256)")
+SIG_TF_SINGLE = bytes.fromhex("c3d58168c5ae7397731d063d5bbf3d657854427343f4c083240f7aacaa2d0f62")
+# Web3.keccak(text="TransferBatch(address,address,address,uint256[],uint256[])")
+SIG_TF_BATCH = bytes.fromhex("4a39dc06d4c0dbc64b70af90fd698a233a518aa5d07e595d983b8c0526c8f7fb")
+
+# --- Селекторы view-функций токена (eth_call без Contract/ABI) ---
+SEL_SYMBOL = bytes.fromhex("95d89b41")  # symbol()
+SEL_DECIMALS = bytes.fromhex("313ce567")  # decimals()
+
+# --- Multicall3 (один и тот же адрес во всех EVM-сетях) ---
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+SEL_AGGREGATE3 = bytes.fromhex("82ad56cb")  # aggregate3((address,bool,bytes)[])
 
 # --- Data classes ---
-@dataclass
+@dataclass(slots=True)
 class TokenTransfer:
     token: str
     symbol: str
@@ -36,7 +48,7 @@ class TokenTransfer:
     raw_amount: int
     token_id: Optional[int] = None
 
-@dataclass
+@dataclass(slots=True)
 class ApprovalChange:
     token: str
     symbol: str
@@ -45,12 +57,12 @@ class ApprovalChange:
     amount: str
     raw_amount: int
 
-@dataclass
+@dataclass(slots=True)
 class TxSummary:
     chain: str
     tx_hash: str
     block_number: int
-    status: int
+    status: Optional[int]  # None — квитанция до Byzantium (без поля status)
     from_addr: str
     to_addr: Optional[str]
     value_eth: float
@@ -60,77 +72,449 @@ class TxSummary:
     transfers: List[TokenTransfer] = field(default_factory=list)
     approvals: List[ApprovalChange] = field(default_factory=list)
 
+# --- Кэш метаданных токенов ---
+TOKEN_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".deltascope", "tokens.sqlite")
+TOKEN_SEED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tokens_seed.json")
+
+class TokenCache:
+    """Постоянный кэш (symbol, decimals, standard) по (chain_id, адрес) в SQLite."""
+
+    def __init__(self, path: str = TOKEN_CACHE_PATH, seed_path: Optional[str] = TOKEN_SEED_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS tokens ("
+            "chain INTEGER, addr TEXT, symbol TEXT, decimals INTEGER, standard TEXT, "
+            "PRIMARY KEY (chain, addr))"
+        )
+        # Сид грузим только в пустую таблицу, а не на каждом запуске
+        empty = self.conn.execute("SELECT 1 FROM tokens LIMIT 1").fetchone() is None
+        if empty and seed_path and os.path.exists(seed_path):
+            self._load_seed(seed_path)
+        self.conn.commit()
+
+    def _load_seed(self, seed_path: str) -> None:
+        with open(seed_path, encoding="utf-8") as f:
+            seed = json.load(f)
+        rows = [
+            (int(chain), addr, symbol, decimals, standard)
+            for chain, tokens in seed.items()
+            for addr, (symbol, decimals, standard) in tokens.items()
+        ]
+        self.conn.executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?, ?, ?, ?)", rows)
+
+    def get(self, chain_id: int, token_addr: str) -> Optional[Tuple[str, int, str]]:
+        row = self.conn.execute(
+            "SELECT symbol, decimals, standard FROM tokens WHERE chain = ? AND addr = ?",
+            (chain_id, token_addr),
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def put(self, chain_id: int, token_addr: str, meta: Tuple[str, int, str]) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?, ?)", (chain_id, token_addr, *meta))
+        self.conn.commit()
+
+    def close(self) -> None:
+        # Снимаем регистрацию, иначе следующий parse_tx на этой сети обратится к закрытой БД
+        for chain_id in [c for c, cache in _CACHE_BY_CHAIN.items() if cache is self]:
+            del _CACHE_BY_CHAIN[chain_id]
+        self.conn.close()
+
 # --- Helpers ---
-def _safe_symbol_and_decimals(w3: Web3, token_addr: str) -> Tuple[str, int, str]:
-    contract = w3.eth.contract(address=token_addr, abi=ERC20_ABI)
-    symbol, decimals, standard = "UNKNOWN", 18, "ERC20"
+def _std_hint(topic0: bytes, topics: List[bytes]) -> str:
+    # ERC721 индексирует tokenId (4 топика), ERC20 кладёт сумму в data (3 топика) — стандарт виден без RPC
+    if topic0 in (SIG_TF_SINGLE, SIG_TF_BATCH):
+        return "ERC1155"
+    return "ERC721" if len(topics) == 4 else "ERC20"
+
+def _meta_fits(meta: Tuple[str, int, str], hint: str) -> bool:
+    # decimals нужны только ERC20; запись без них (ERC721/1155) для ERC20 не годится
+    return hint != "ERC20" or meta[2] == "ERC20"
+
+# Коды/фразы JSON-RPC ошибок, которыми провайдеры сообщают о лимите запросов
+_RATE_LIMIT_CODES = {-32005, 429}
+_RATE_LIMIT_WORDS = ("rate limit", "too many requests", "429")
+
+def _is_transport_error(e: Exception) -> bool:
+    # Сеть, таймаут, HTTP-ошибка (в т.ч. 429) или лимит запросов в теле ответа — не свойство контракта
+    if isinstance(e, (OSError, TimeoutError)):  # requests.RequestException — подкласс OSError
+        return True
+    # web3 v7+: Web3RPCError.rpc_response; v6: ValueError({"code", "message"})
+    rpc_response = getattr(e, "rpc_response", None)
+    error = rpc_response.get("error") if isinstance(rpc_response, dict) else (e.args[0] if e.args else None)
+    if not isinstance(error, dict):
+        return False
+    message = str(error.get("message", "")).lower()
+    return error.get("code") in _RATE_LIMIT_CODES or any(w in message for w in _RATE_LIMIT_WORDS)
+
+def _call_view(w3: Web3, token_addr: str, selector: bytes, abi_type: str) -> Any:
+    from eth_abi import decode as abi_decode
+    from eth_abi.exceptions import DecodingError
+
+    # Любая ошибка исполнения (revert, invalid opcode, out of gas у старых throw-токенов)
+    # или неразбираемый ответ — метода нет, возвращаем None; сетевые ошибки и 429 пробрасываем
     try:
-        symbol = contract.functions.symbol().call()
-    except Exception:
-        pass
+        raw = w3.eth.call({"to": token_addr, "data": selector})
+    except Exception as e:
+        if _is_transport_error(e):
+            raise
+        return None
     try:
-        decimals = contract.functions.decimals().call()
-    except Exception:
-        # Может быть ERC721
-        standard = "ERC721"
-        contract721 = w3.eth.contract(address=token_addr, abi=ERC721_ABI)
+        return abi_decode([abi_type], raw)[0]
+    except DecodingError:
+        return None
+
+def _safe_symbol_and_decimals(w3: Web3, token_addr: str, hint: str = "ERC20") -> Tuple[str, int, str]:
+    symbol = _call_view(w3, token_addr, SEL_SYMBOL, "string")
+    decimals = _call_view(w3, token_addr, SEL_DECIMALS, "uint8") if hint == "ERC20" else None
+    return symbol if symbol is not None else "UNKNOWN", decimals or 0, hint
+
+def _multicall_meta(w3: Web3, tokens: Dict[str, str]) -> Dict[str, Tuple[str, int, str]]:
+    from eth_abi import decode as abi_decode, encode as abi_encode
+    from eth_abi.exceptions import DecodingError
+
+    # Все symbol()/decimals() одним eth_call через Multicall3.aggregate3 (allowFailure=True);
+    # decimals() запрашиваем только у ERC20
+    calls, layout = [], []
+    for addr, hint in tokens.items():
+        calls.append((addr, True, SEL_SYMBOL))
+        if hint == "ERC20":
+            calls.append((addr, True, SEL_DECIMALS))
+        layout.append((addr, hint))
+    raw = w3.eth.call({"to": MULTICALL3, "data": SEL_AGGREGATE3 + abi_encode(["(address,bool,bytes)[]"], [calls])})
+    (results,) = abi_decode(["(bool,bytes)[]"], raw)
+
+    out, i = {}, 0
+    for addr, hint in layout:
+        symbol, decimals = "UNKNOWN", 0
+        sym_ok, sym_raw = results[i]
+        i += 1
+        if sym_ok:
+            try:
+                symbol = abi_decode(["string"], sym_raw)[0]
+            except DecodingError:
+                pass
+        if hint == "ERC20":
+            dec_ok, dec_raw = results[i]
+            i += 1
+            if dec_ok:
+                try:
+                    decimals = abi_decode(["uint8"], dec_raw)[0]
+                except DecodingError:
+                    pass
+        out[addr] = (symbol, decimals, hint)
+    return out
+
+# Web3-клиент и дисковый кэш для каждого chain_id, чтобы _meta кэшировался только по (chain_id, адрес)
+_W3_BY_CHAIN: Dict[int, Web3] = {}
+_CACHE_BY_CHAIN: Dict[int, TokenCache] = {}
+# Метаданные, полученные пачкой (Multicall3 или пул потоков), и сети, где Multicall3 недоступен
+_PREFETCHED: Dict[Tuple[int, str], Tuple[str, int, str]] = {}
+_NO_MULTICALL: Set[int] = set()
+
+META_WORKERS = 8  # параллельных eth_call, если Multicall3 недоступен
+
+def _prefetch_meta(w3: Web3, chain_id: int, tokens: Dict[str, str]) -> None:
+    cache = _CACHE_BY_CHAIN.get(chain_id)
+    missing = {}
+    for addr, hint in tokens.items():
+        known = _PREFETCHED.get((chain_id, addr))
+        if known is None and cache is not None:
+            known = cache.get(chain_id, addr)
+        if known is None or not _meta_fits(known, hint):
+            missing[addr] = hint
+    if not missing:
+        return
+    from eth_abi.exceptions import DecodingError
+
+    fetched = None
+    if chain_id not in _NO_MULTICALL:
         try:
-            symbol = contract721.functions.symbol().call()
-        except Exception:
-            pass
-        decimals = 0
-    return symbol, decimals, standard
+            fetched = _multicall_meta(w3, missing)
+        except DecodingError:
+            # Пустой "0x" или чужой ответ — Multicall3 в этой сети нет, больше не пробуем
+            _NO_MULTICALL.add(chain_id)
+        except Exception as e:
+            # Сетевые ошибки и 429 пробрасываем: это не повод отключать Multicall3 навсегда;
+            # ошибка исполнения aggregate3 — в этот раз берём токены по одному
+            if _is_transport_error(e):
+                raise
+    if fetched is None:
+        # Запросы по токенам параллельно: на сетевом I/O GIL отпускается
+        with ThreadPoolExecutor(max_workers=min(META_WORKERS, len(missing))) as pool:
+            metas = pool.map(lambda item: _safe_symbol_and_decimals(w3, *item), missing.items())
+            fetched = dict(zip(missing, metas))
+    for addr, meta in fetched.items():
+        _PREFETCHED[(chain_id, addr)] = meta
+
+@lru_cache(maxsize=4096)
+def _meta(chain_id: int, token_addr: str, hint: str = "ERC20") -> Tuple[str, int, str]:
+    # symbol/decimals неизменяемы после деплоя — запрашиваем один раз на токен
+    cache = _CACHE_BY_CHAIN.get(chain_id)
+    if cache is not None:
+        hit = cache.get(chain_id, token_addr)
+        if hit is not None and _meta_fits(hit, hint):
+            return hit
+    meta = _PREFETCHED.get((chain_id, token_addr))
+    if meta is None or not _meta_fits(meta, hint):
+        meta = _safe_symbol_and_decimals(_W3_BY_CHAIN[chain_id], token_addr, hint)
+    # Сюда доходят только ответы контракта или реверты: сетевые ошибки пробрасываются
+    # из _safe_symbol_and_decimals/_prefetch_meta, поэтому случайный сбой на диск не попадёт
+    if cache is not None:
+        cache.put(chain_id, token_addr, meta)
+    return meta
+
+@lru_cache(maxsize=4096)
+def _checksum(addr: Any) -> str:
+    # keccak на каждый вызов; одни и те же адреса повторяются по всей квитанции
+    from web3 import Web3
+
+    return Web3.to_checksum_address(addr)
+
+def _maybe_cs(addr: str) -> str:
+    # web3 отдаёт lg["address"] уже в checksum-виде (смешанный регистр), сырой JSON-RPC — в нижнем
+    return addr if addr != addr.lower() else _checksum(addr)
+
+def _addr_from_topic(topic: bytes) -> str:
+    # Адрес — младшие 20 байт 32-байтного топика; без промежуточной hex-строки
+    return _checksum(bytes(topic)[-20:])
+
+@lru_cache(maxsize=32)
+def _pow10(decimals: int) -> int:
+    return 10 ** decimals
 
 def _format_amount(raw: int, decimals: int) -> str:
+    # Целочисленное деление: точно для любого uint256, без float
     if decimals == 0:
         return str(raw)
-    scaled = raw / (10 ** decimals)
-    return f"{scaled:.8f}".rstrip("0").rstrip(".")
+    q, r = divmod(raw, _pow10(decimals))
+    if r == 0:
+        return str(q)
+    frac = f"{r:0{decimals}d}".rstrip("0")
+    return f"{q}.{frac}"
+
+# --- Параллельная загрузка транзакций ---
+RPC_CONCURRENCY = 10  # одновременных запросов к публичному RPC
+RPC_BATCH_SIZE = 50  # вызовов в одном JSON-RPC batch
+
+def _hex_int(value: Optional[str]) -> int:
+    return int(value, 16) if value else 0
+
+def _hex_bytes(value: str) -> bytes:
+    # bytes.fromhex — C-реализация, без валидации и обёрток HexBytes
+    return bytes.fromhex(value[2:])
+
+def _normalize_tx(tx: Dict[str, Any]) -> Dict[str, Any]:
+    # Сырой JSON-RPC ответ -> те же типы, что отдаёт w3.eth.get_transaction
+    return {
+        "from": _checksum(tx["from"]),
+        "to": _checksum(tx["to"]) if tx.get("to") else None,
+        "value": _hex_int(tx["value"]),
+        "blockNumber": _hex_int(tx.get("blockNumber")),
+    }
+
+def _normalize_receipt(receipt: Dict[str, Any]) -> Dict[str, Any]:
+    # Сырой JSON-RPC ответ -> те же типы, что отдаёт w3.eth.get_transaction_receipt
+    return {
+        "blockNumber": _hex_int(receipt["blockNumber"]),
+        # До Byzantium вместо status был root — статус неизвестен, а не FAIL
+        "status": _hex_int(receipt["status"]) if receipt.get("status") is not None else None,
+        "gasUsed": _hex_int(receipt["gasUsed"]),
+        "effectiveGasPrice": _hex_int(receipt.get("effectiveGasPrice")),
+        "logs": [
+            {
+                "address": lg["address"],
+                "topics": [_hex_bytes(t) for t in lg["topics"]],
+                "data": _hex_bytes(lg["data"]),
+                "logIndex": _hex_int(lg.get("logIndex")),
+            }
+            for lg in receipt["logs"]
+        ],
+    }
+
+async def _rpc_batch(session: aiohttp.ClientSession, rpc: str, sem: asyncio.Semaphore,
+                     calls: List[Tuple[str, list]]) -> List[Any]:
+    # Один HTTP-запрос с JSON-RPC 2.0 batch; результаты в порядке calls,
+    # ошибка отдельного вызова возвращается на его месте как RuntimeError
+    payload = [{"jsonrpc": "2.0", "id": i, "method": m, "params": p} for i, (m, p) in enumerate(calls)]
+    async with sem:
+        async with session.post(rpc, json=payload) as resp:
+            resp.raise_for_status()
+            replies = await resp.json(content_type=None)
+    if not isinstance(replies, list):
+        raise RuntimeError(f"RPC отклонил batch-запрос: {replies.get('error', replies)}")
+    by_id = {r.get("id"): r for r in replies}
+    results = []
+    for i, (method, _) in enumerate(calls):
+        reply = by_id.get(i)
+        if reply is None or "error" in reply:
+            results.append(RuntimeError(f"{method}: {reply['error'] if reply else 'нет ответа'}"))
+        else:
+            results.append(reply["result"])
+    return results
+
+async def _call_many(session: aiohttp.ClientSession, rpc: str, sem: asyncio.Semaphore,
+                     calls: List[Tuple[str, list]]) -> List[Any]:
+    # Режем на batch-и по RPC_BATCH_SIZE и шлём их параллельно
+    chunks = [calls[i:i + RPC_BATCH_SIZE] for i in range(0, len(calls), RPC_BATCH_SIZE)]
+    replies = await asyncio.gather(*(_rpc_batch(session, rpc, sem, c) for c in chunks), return_exceptions=True)
+    results = []
+    for chunk, reply in zip(chunks, replies):
+        results.extend([reply] * len(chunk) if isinstance(reply, BaseException) else reply)
+    return results
+
+async def gather_all(rpc: str, tx_hashes: List[str]) -> List[Any]:
+    """Загружает (tx, receipt) для всех хэшей параллельно; ошибки возвращаются на месте результата."""
+    import aiohttp
+
+    sem = asyncio.Semaphore(RPC_CONCURRENCY)
+    receipts: Dict[str, Any] = {}
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        if len(tx_hashes) == 1:
+            # Один хэш: транзакция и квитанция одним batch — один round-trip
+            h = tx_hashes[0]
+            try:
+                tx, receipts[h.lower()] = await _rpc_batch(session, rpc, sem, [
+                    ("eth_getTransactionByHash", [h]),
+                    ("eth_getTransactionReceipt", [h]),
+                ])
+            except Exception as e:
+                tx = e
+            txs = [tx]
+        else:
+            # 1. Все транзакции — чтобы узнать, в каких они блоках
+            txs = await _call_many(session, rpc, sem, [("eth_getTransactionByHash", [h]) for h in tx_hashes])
+            by_block: Dict[int, Set[str]] = {}
+            for h, tx in zip(tx_hashes, txs):
+                if isinstance(tx, dict) and tx.get("blockNumber"):
+                    by_block.setdefault(_hex_int(tx["blockNumber"]), set()).add(h.lower())
+
+            # 2+3. Блок с несколькими нашими транзакциями — один eth_getBlockReceipts (Geth/Erigon/Reth),
+            # одиночные — batch-ем eth_getTransactionReceipt; всё одновременно
+            shared = [b for b, hashes in by_block.items() if len(hashes) > 1]
+            singles = [h for hashes in by_block.values() if len(hashes) == 1 for h in hashes]
+            block_replies, single_replies = await asyncio.gather(
+                asyncio.gather(
+                    *(_rpc_batch(session, rpc, sem, [("eth_getBlockReceipts", [hex(b)])]) for b in shared),
+                    return_exceptions=True,
+                ),
+                _call_many(session, rpc, sem, [("eth_getTransactionReceipt", [h]) for h in singles]),
+            )
+            receipts.update(zip(singles, single_replies))
+            for b, reply in zip(shared, block_replies):
+                if isinstance(reply, BaseException) or not isinstance(reply[0], list):
+                    continue
+                for r in reply[0]:
+                    if r["transactionHash"].lower() in by_block[b]:
+                        receipts[r["transactionHash"].lower()] = r
+
+            # Нода не поддерживает eth_getBlockReceipts — добираем такие квитанции по хэшу
+            missed = [h for b in shared for h in by_block[b] if h not in receipts]
+            if missed:
+                missed_replies = await _call_many(session, rpc, sem, [("eth_getTransactionReceipt", [h]) for h in missed])
+                receipts.update(zip(missed, missed_replies))
+
+    results = []
+    for h, tx in zip(tx_hashes, txs):
+        receipt = receipts.get(h.lower())
+        if isinstance(tx, BaseException) or isinstance(receipt, BaseException):
+            results.append(tx if isinstance(tx, BaseException) else receipt)
+        elif tx is None or receipt is None:
+            results.append(ValueError("транзакция не найдена или ещё не в блоке"))
+        else:
+            results.append((_normalize_tx(tx), _normalize_receipt(receipt)))
+    return results
+
+# --- Log handlers ---
+@dataclass
+class _ParseCtx:
+    chain_id: int
+    transfers: List[TokenTransfer] = field(default_factory=list)
+    approvals: List[ApprovalChange] = field(default_factory=list)
+
+def _handle_transfer(lg: LogReceipt, ctx: _ParseCtx) -> None:
+    addr = _maybe_cs(lg["address"])
+    hint = _std_hint(SIG_TRANSFER, lg["topics"])
+    symbol, decimals, _ = _meta(ctx.chain_id, addr, hint)
+    from_addr = _addr_from_topic(lg["topics"][1])
+    to_addr = _addr_from_topic(lg["topics"][2])
+    # ERC721: tokenId в topics[3], data пустая
+    raw_amount = int.from_bytes(lg["topics"][3] if hint == "ERC721" else lg["data"], byteorder="big")
+    # Стандарт определяется только числом топиков: ERC20 с decimals == 0 остаётся ERC20
+    if hint == "ERC721":
+        token_id, amount_str = raw_amount, "1"
+    else:
+        token_id, amount_str = None, _format_amount(raw_amount, decimals)
+    ctx.transfers.append(TokenTransfer(addr, symbol, hint, from_addr, to_addr, amount_str, raw_amount, token_id))
+
+def _handle_tf_single(lg: LogReceipt, ctx: _ParseCtx) -> None:
+    addr = _maybe_cs(lg["address"])
+    symbol, _, _ = _meta(ctx.chain_id, addr, "ERC1155")
+    from_addr = _addr_from_topic(lg["topics"][2])
+    to_addr = _addr_from_topic(lg["topics"][3])
+    data_bytes = lg["data"]  # уже bytes/HexBytes (web3 или _normalize_receipt)
+    token_id = int.from_bytes(data_bytes[:32], "big")
+    raw_amount = int.from_bytes(data_bytes[32:64], "big")
+    ctx.transfers.append(TokenTransfer(addr, symbol, "ERC1155", from_addr, to_addr, str(raw_amount), raw_amount, token_id))
+
+def _handle_tf_batch(lg: LogReceipt, ctx: _ParseCtx) -> None:
+    addr = _maybe_cs(lg["address"])
+    symbol, _, _ = _meta(ctx.chain_id, addr, "ERC1155")
+    from_addr = _addr_from_topic(lg["topics"][2])
+    to_addr = _addr_from_topic(lg["topics"][3])
+    ctx.transfers.append(TokenTransfer(addr, symbol, "ERC1155", from_addr, to_addr, "BATCH", 0, None))
+
+def _handle_approval(lg: LogReceipt, ctx: _ParseCtx) -> None:
+    addr = _maybe_cs(lg["address"])
+    hint = _std_hint(SIG_APPROVAL, lg["topics"])
+    symbol, decimals, _ = _meta(ctx.chain_id, addr, hint)
+    owner = _addr_from_topic(lg["topics"][1])
+    spender = _addr_from_topic(lg["topics"][2])
+    raw_amount = int.from_bytes(lg["topics"][3] if hint == "ERC721" else lg["data"], byteorder="big")
+    amount_str = _format_amount(raw_amount, decimals)
+    ctx.approvals.append(ApprovalChange(addr, symbol, owner, spender, amount_str, raw_amount))
+
+# topic0 -> обработчик; метаданные токена запрашиваются только внутри обработчика
+HANDLERS: Dict[bytes, Callable[[LogReceipt, _ParseCtx], None]] = {
+    SIG_TRANSFER: _handle_transfer,
+    SIG_TF_SINGLE: _handle_tf_single,
+    SIG_TF_BATCH: _handle_tf_batch,
+    SIG_APPROVAL: _handle_approval,
+}
 
 # --- Core parser ---
-def parse_tx(w3: Web3, tx_hash: str) -> TxSummary:
-    tx = w3.eth.get_transaction(tx_hash)
-    receipt = w3.eth.get_transaction_receipt(tx_hash)
-    chain_id = w3.eth.chain_id
+def parse_tx(w3: Web3, tx_hash: str, token_cache: Optional[TokenCache] = None,
+             tx: Optional[Dict[str, Any]] = None, receipt: Optional[Dict[str, Any]] = None,
+             chain_id: Optional[int] = None) -> TxSummary:
+    if tx is None:
+        tx = w3.eth.get_transaction(tx_hash)
+    if receipt is None:
+        receipt = w3.eth.get_transaction_receipt(tx_hash)
+    if chain_id is None:
+        chain_id = w3.eth.chain_id
+    _W3_BY_CHAIN[chain_id] = w3
+    if token_cache is not None:
+        _CACHE_BY_CHAIN[chain_id] = token_cache
 
-    transfers, approvals = [], []
+    ctx = _ParseCtx(chain_id)
 
+    # Первый проход: уникальные токены, которым нужны метаданные, — одним Multicall3-запросом
+    unique_tokens: Dict[str, str] = {}
     for lg in receipt["logs"]:
-        topic0 = lg["topics"][0].hex().lower()
-        addr = Web3.to_checksum_address(lg["address"])
-        if topic0 in (SIG_TRANSFER, SIG_TF_SINGLE, SIG_TF_BATCH, SIG_APPROVAL):
-            symbol, decimals, erc_guess = _safe_symbol_and_decimals(w3, addr)
-
-        if topic0 == SIG_TRANSFER:
-            from_addr = Web3.to_checksum_address("0x" + lg["topics"][1].hex()[-40:])
-            to_addr = Web3.to_checksum_address("0x" + lg["topics"][2].hex()[-40:])
-            raw_amount = int.from_bytes(lg["data"], byteorder="big")
-            token_id, amount_str = None, None
-            if erc_guess == "ERC721" or (decimals == 0 and raw_amount < 10**10):
-                token_id, amount_str, standard = raw_amount, "1", "ERC721"
-            else:
-                amount_str, standard = _format_amount(raw_amount, decimals), "ERC20"
-            transfers.append(TokenTransfer(addr, symbol, standard, from_addr, to_addr, amount_str, raw_amount, token_id))
-
-        elif topic0 == SIG_TF_SINGLE:
-            from_addr = Web3.to_checksum_address("0x" + lg["topics"][2].hex()[-40:])
-            to_addr = Web3.to_checksum_address("0x" + lg["topics"][3].hex()[-40:])
-            data_bytes = HexBytes(lg["data"])
-            token_id = int.from_bytes(data_bytes[:32], "big")
-            raw_amount = int.from_bytes(data_bytes[32:64], "big")
-            transfers.append(TokenTransfer(addr, symbol, "ERC1155", from_addr, to_addr, str(raw_amount), raw_amount, token_id))
-
-        elif topic0 == SIG_TF_BATCH:
-            from_addr = Web3.to_checksum_address("0x" + lg["topics"][2].hex()[-40:])
-            to_addr = Web3.to_checksum_address("0x" + lg["topics"][3].hex()[-40:])
-            transfers.append(TokenTransfer(addr, symbol, "ERC1155", from_addr, to_addr, "BATCH", 0, None))
-
-        elif topic0 == SIG_APPROVAL:
-            owner = Web3.to_checksum_address("0x" + lg["topics"][1].hex()[-40:])
-            spender = Web3.to_checksum_address("0x" + lg["topics"][2].hex()[-40:])
-            raw_amount = int.from_bytes(lg["data"], byteorder="big")
-            amount_str = _format_amount(raw_amount, decimals)
-            approvals.append(ApprovalChange(addr, symbol, owner, spender, amount_str, raw_amount))
+        topic0 = bytes(lg["topics"][0]) if lg["topics"] else None
+        if topic0 not in HANDLERS:
+            continue
+        addr = _maybe_cs(lg["address"])
+        # Если токен встречается и как ERC20, ему нужны decimals
+        if unique_tokens.get(addr) != "ERC20":
+            unique_tokens[addr] = _std_hint(topic0, lg["topics"])
+    _prefetch_meta(w3, chain_id, unique_tokens)
+
+    for lg in receipt["logs"]:
+        handler = HANDLERS.get(bytes(lg["topics"][0])) if lg["topics"] else None
+        if handler is None:
+            continue
+        handler(lg, ctx)
 
     gas_used = receipt["gasUsed"]
     egp = receipt.get("effectiveGasPrice", 0)
@@ -141,19 +525,42 @@ def parse_tx(w3: Web3, tx_hash: str) -> TxSummary:
         chain=str(chain_id),
         tx_hash=tx_hash,
         block_number=receipt["blockNumber"],
-        status=receipt["status"],
+        status=receipt.get("status"),
         from_addr=tx["from"],
         to_addr=tx["to"],
         value_eth=value_eth,
         gas_used=gas_used,
         effective_gas_price_wei=int(egp),
         fee_eth=fee_eth,
-        transfers=transfers,
-        approvals=approvals,
+        transfers=ctx.transfers,
+        approvals=ctx.approvals,
     )
 
+def _fits_orjson(reports: List[TxSummary]) -> bool:
+    # orjson не умеет целые >= 2**64, а uint256-суммы и безлимитные аппрувы встречаются постоянно
+    limit = 1 << 64
+    return all(
+        r.effective_gas_price_wei < limit
+        and all(t.raw_amount < limit and (t.token_id or 0) < limit for t in r.transfers)
+        and all(a.raw_amount < limit for a in r.approvals)
+        for r in reports
+    )
+
+def _dump_reports(reports: List[TxSummary], path: str) -> None:
+    try:
+        import orjson
+    except ImportError:  # orjson опционален: без него JSON пишет stdlib
+        orjson = None
+    if orjson is not None and _fits_orjson(reports):
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(reports, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_DATACLASS))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([asdict(r) for r in reports], f, ensure_ascii=False, indent=2)
+
 # --- CLI ---
 DEFAULT_RPC = "https://cloudflare-eth.com"
+_STATUS_LABELS = {1: "SUCCESS", None: "UNKNOWN"}
 
 def main(argv: Optional[List[str]] = None) -> int:
     ap = argparse.ArgumentParser(description="DeltaScope — дифф транзакции для EVM: токен-трансферы, аппрувы, комиссии.")
@@ -163,52 +570,69 @@ def main(argv: Optional[List[str]] = None) -> int:
     ap.add_argument("--watch", nargs="*", default=[], help="Подсветка интересующих адресов")
     args = ap.parse_args(argv)
 
+    from tabulate import tabulate
+    from web3 import Web3
+
     w3 = Web3(Web3.HTTPProvider(args.rpc, request_kwargs={"timeout": 30}))
     if not w3.is_connected():
         raise SystemExit("Не удалось подключиться к RPC.")
 
-    reports = []
-    for txh in args.tx:
-        try:
-            summary = parse_tx(w3, txh)
-        except Exception as e:
-            print(f"[Ошибка] {txh}: {e}")
-            continue
+    try:
+        token_cache = TokenCache()
+    except (OSError, sqlite3.Error) as e:
+        print(f"[Предупреждение] Кэш токенов недоступен: {e}")
+        token_cache = None
 
-        print("=" * 80)
-        print(f"Tx: {summary.tx_hash} | Chain: {summary.chain} | Block: {summary.block_number} | "
-              f"Status: {'SUCCESS' if summary.status == 1 else 'FAIL'}")
-        print(f"From: {summary.from_addr} -> To: {summary.to_addr}")
-        print(f"ETH value: {summary.value_eth} | Fee ETH: {summary.fee_eth:.6f}")
-
-        if summary.transfers:
-            rows = []
-            watch_lower = [w.lower() for w in args.watch]
-            for t in summary.transfers:
-                highlight = "★" if (t.from_addr.lower() in watch_lower or t.to_addr.lower() in watch_lower) else ""
-                rows.append([highlight, t.standard, t.symbol, t.token, t.from_addr, t.to_addr, t.token_id or "-", t.amount])
-            print("\nТокен-трансферы:")
-            print(tabulate(rows, headers=["*", "Std", "Sym", "Token", "From", "To", "TokenID", "Amount"], tablefmt="github"))
-        else:
-            print("\nТокен-трансферы: нет")
-
-        if summary.approvals:
-            rows = []
-            watch_lower = [w.lower() for w in args.watch]
-            for a in summary.approvals:
-                highlight = "★" if (a.owner.lower() in watch_lower or a.spender.lower() in watch_lower) else ""
-                rows.append([highlight, a.symbol, a.token, a.owner, a.spender, a.amount])
-            print("\nАппрувы:")
-            print(tabulate(rows, headers=["*", "Sym", "Token", "Owner", "Spender", "Amount"], tablefmt="github"))
-        else:
-            print("\nАппрувы: нет")
+    try:
+        chain_id = w3.eth.chain_id
+        fetched = asyncio.run(gather_all(args.rpc, args.tx))
+
+        watch_lower = frozenset(w.lower() for w in args.watch)
+        reports = []
+        for txh, result in zip(args.tx, fetched):
+            try:
+                if isinstance(result, BaseException):
+                    raise result
+                tx, receipt = result
+                summary = parse_tx(w3, txh, token_cache, tx=tx, receipt=receipt, chain_id=chain_id)
+            except Exception as e:
+                print(f"[Ошибка] {txh}: {e}")
+                continue
+
+            print("=" * 80)
+            print(f"Tx: {summary.tx_hash} | Chain: {summary.chain} | Block: {summary.block_number} | "
+                  f"Status: {_STATUS_LABELS.get(summary.status, 'FAIL')}")
+            print(f"From: {summary.from_addr} -> To: {summary.to_addr}")
+            print(f"ETH value: {summary.value_eth} | Fee ETH: {summary.fee_eth:.6f}")
+
+            if summary.transfers:
+                rows = []
+                for t in summary.transfers:
+                    highlight = "★" if watch_lower and not watch_lower.isdisjoint((t.from_addr.lower(), t.to_addr.lower())) else ""
+                    rows.append([highlight, t.standard, t.symbol, t.token, t.from_addr, t.to_addr, t.token_id or "-", t.amount])
+                print("\nТокен-трансферы:")
+                print(tabulate(rows, headers=["*", "Std", "Sym", "Token", "From", "To", "TokenID", "Amount"], tablefmt="github"))
+            else:
+                print("\nТокен-трансферы: нет")
+
+            if summary.approvals:
+                rows = []
+                for a in summary.approvals:
+                    highlight = "★" if watch_lower and not watch_lower.isdisjoint((a.owner.lower(), a.spender.lower())) else ""
+                    rows.append([highlight, a.symbol, a.token, a.owner, a.spender, a.amount])
+                print("\nАппрувы:")
+                print(tabulate(rows, headers=["*", "Sym", "Token", "Owner", "Spender", "Amount"], tablefmt="github"))
+            else:
+                print("\nАппрувы: нет")
 
-        reports.append(summary.__dict__)
+            reports.append(summary)
 
-    if args.json_path:
-        with open(args.json_path, "w", encoding="utf-8") as f:
-            json.dump(reports, f, ensure_ascii=False, indent=2)
-        print(f"\nJSON сохранён в: {args.json_path}")
+        if args.json_path:
+            _dump_reports(reports, args.json_path)
+            print(f"\nJSON сохранён в: {args.json_path}")
+    finally:
+        if token_cache is not None:
+            token_cache.close()
 
     return 0
 
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import deltascope  # noqa: E402
+from web3 import Web3  # noqa: E402
+
+
+@pytest.mark.parametrize("name, signature", [
+    ("SIG_TRANSFER", "Transfer(address,address,uint256)"),
+    ("SIG_APPROVAL", "Approval(address,address,uint256)"),
+    ("SIG_TF_SINGLE", "TransferSingle(address,address,address,uint256,uint256)"),
+    ("SIG_TF_BATCH", "TransferBatch(address,address,address,uint256[],uint256[])"),
+])
+def test_event_signature_matches_keccak(name, signature):
+    assert getattr(deltascope, name) == bytes(Web3.keccak(text=signature))